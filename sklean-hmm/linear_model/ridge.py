@@ -28,6 +28,14 @@ from ..externals import six
 from ..metrics.scorer import _deprecate_loss_and_score_funcs
 
 
+# Set once the deprecation warning for passing class_weight to
+# RidgeClassifierCV.fit has been emitted, so that repeated fits (e.g. in
+# nested cross-validation) do not go through the warnings machinery again.
+# The gate is process-wide and is not reset by the warnings filters: tests
+# that expect the warning must set it back to False first.
+_WARNED_CW_FIT = False
+
+
 def _solve_sparse_cg(X, y, alpha, max_iter=None, tol=1e-3):
     n_samples, n_features = X.shape
     X1 = sp_linalg.aslinearoperator(X)
@@ -611,11 +619,13 @@ class _RidgeGCV(LinearModel):
         K = safe_sparse_dot(X, X.T, dense_output=True)
         v, Q = linalg.eigh(K)
         QT_y = np.dot(Q.T, y)
-        return v, Q, QT_y
+        # Q ** 2 does not depend on alpha: compute it once for all alphas
+        return v, Q, QT_y, Q ** 2
 
-    def _decomp_diag(self, v_prime, Q):
+    def _decomp_diag(self, v_prime, Q_sq):
         # compute diagonal of the matrix: dot(Q, dot(diag(v_prime), Q^T))
-        return (v_prime * Q ** 2).sum(axis=-1)
+        # Q_sq = Q ** 2 is returned by _pre_compute / _pre_compute_svd
+        return np.dot(Q_sq, v_prime)
 
     def _diag_dot(self, D, B):
         # compute dot(diag(D), B)
@@ -624,21 +634,21 @@ class _RidgeGCV(LinearModel):
             D = D[(slice(None), ) + (np.newaxis, ) * (len(B.shape) - 1)]
         return D * B
 
-    def _errors(self, alpha, y, v, Q, QT_y):
+    def _errors(self, alpha, y, v, Q, QT_y, Q_sq):
         # don't construct matrix G, instead compute action on y & diagonal
         w = 1.0 / (v + alpha)
         c = np.dot(Q, self._diag_dot(w, QT_y))
-        G_diag = self._decomp_diag(w, Q)
+        G_diag = self._decomp_diag(w, Q_sq)
         # handle case where y is 2-d
         if len(y.shape) != 1:
             G_diag = G_diag[:, np.newaxis]
         return (c / G_diag) ** 2, c
 
-    def _values(self, alpha, y, v, Q, QT_y):
+    def _values(self, alpha, y, v, Q, QT_y, Q_sq):
         # don't construct matrix G, instead compute action on y & diagonal
         w = 1.0 / (v + alpha)
         c = np.dot(Q, self._diag_dot(w, QT_y))
-        G_diag = self._decomp_diag(w, Q)
+        G_diag = self._decomp_diag(w, Q_sq)
         # handle case where y is 2-d
         if len(y.shape) != 1:
             G_diag = G_diag[:, np.newaxis]
@@ -650,21 +660,21 @@ class _RidgeGCV(LinearModel):
         U, s, _ = linalg.svd(X, full_matrices=0)
         v = s ** 2
         UT_y = np.dot(U.T, y)
-        return v, U, UT_y
+        return v, U, UT_y, U ** 2
 
-    def _errors_svd(self, alpha, y, v, U, UT_y):
+    def _errors_svd(self, alpha, y, v, U, UT_y, U_sq):
         w = ((v + alpha) ** -1) - (alpha ** -1)
         c = np.dot(U, self._diag_dot(w, UT_y)) + (alpha ** -1) * y
-        G_diag = self._decomp_diag(w, U) + (alpha ** -1)
+        G_diag = self._decomp_diag(w, U_sq) + (alpha ** -1)
         if len(y.shape) != 1:
             # handle case where y is 2-d
             G_diag = G_diag[:, np.newaxis]
         return (c / G_diag) ** 2, c
 
-    def _values_svd(self, alpha, y, v, U, UT_y):
+    def _values_svd(self, alpha, y, v, U, UT_y, U_sq):
         w = ((v + alpha) ** -1) - (alpha ** -1)
         c = np.dot(U, self._diag_dot(w, UT_y)) + (alpha ** -1) * y
-        G_diag = self._decomp_diag(w, U) + (alpha ** -1)
+        G_diag = self._decomp_diag(w, U_sq) + (alpha ** -1)
         if len(y.shape) != 1:
             # handle case when y is 2-d
             G_diag = G_diag[:, np.newaxis]
@@ -723,7 +733,7 @@ class _RidgeGCV(LinearModel):
         else:
             raise ValueError('bad gcv_mode "%s"' % gcv_mode)
 
-        v, Q, QT_y = _pre_compute(X, y)
+        v, Q, QT_y, Q_sq = _pre_compute(X, y)
         n_y = 1 if len(y.shape) == 1 else y.shape[1]
         cv_values = np.zeros((n_samples * n_y, len(self.alphas)))
         C = []
@@ -737,9 +747,9 @@ class _RidgeGCV(LinearModel):
 
         for i, alpha in enumerate(self.alphas):
             if error:
-                out, c = _errors(sample_weight * alpha, y, v, Q, QT_y)
+                out, c = _errors(sample_weight * alpha, y, v, Q, QT_y, Q_sq)
             else:
-                out, c = _values(sample_weight * alpha, y, v, Q, QT_y)
+                out, c = _values(sample_weight * alpha, y, v, Q, QT_y, Q_sq)
             cv_values[:, i] = out.ravel()
             C.append(c)
 
@@ -1020,13 +1030,15 @@ class RidgeClassifierCV(LinearClassifierMixin, _BaseRidgeCV):
         self : object
             Returns self.
         """
+        global _WARNED_CW_FIT
         if class_weight is None:
             class_weight = self.class_weight
-        else:
+        elif not _WARNED_CW_FIT:
             warnings.warn("'class_weight' is now an initialization parameter."
                           " Using it in the 'fit' method is deprecated and "
                           "will be removed in 0.15.", DeprecationWarning,
                           stacklevel=2)
+            _WARNED_CW_FIT = True
 
         self._label_binarizer = LabelBinarizer(pos_label=1, neg_label=-1)
         Y = self._label_binarizer.fit_transform(y)
@@ -15,8 +15,8 @@ from ..externals.joblib import Parallel, delayed
 from .base import LinearClassifierMixin, SparseCoefMixin
 from ..base import BaseEstimator, RegressorMixin
 from ..feature_selection.from_model import _LearntSelectorMixin
-from ..utils import (array2d, atleast2d_or_csr, check_arrays, deprecated,
-                     column_or_1d)
+from ..utils import (array2d, atleast2d_or_csc, atleast2d_or_csr,
+                     check_arrays, deprecated, column_or_1d, gen_batches)
 from ..utils.extmath import safe_sparse_dot
 from ..utils.multiclass import _check_partial_fit_first_call
 from ..externals import six
@@ -46,6 +46,16 @@ intercept oscillation."""
 DEFAULT_EPSILON = 0.1
 """Default value of ``epsilon`` parameter. """
 
+_OVA_MAX_NBYTES = "1M"
+"""Size above which arrays are memory-mapped for the OvA workers."""
+
+_PROBA_BATCH_NBYTES = 256 * 1024
+"""Size of the block of scores processed at once by ``predict_proba``."""
+
+_LABEL_LUT_RANGE_FACTOR = 8
+"""Integer class labels spanning at most this many values per class are
+encoded with a lookup table."""
+
 
 class BaseSGD(six.with_metaclass(ABCMeta, BaseEstimator, SparseCoefMixin)):
     """Base class for SGD classification and regression."""
@@ -101,9 +111,11 @@ class BaseSGD(six.with_metaclass(ABCMeta, BaseEstimator, SparseCoefMixin)):
             if self.eta0 <= 0.0:
                 raise ValueError("eta0 must be > 0")
 
-        # raises ValueError if not registered
-        self._get_penalty_type(self.penalty)
-        self._get_learning_rate_type(self.learning_rate)
+        # raises ValueError if not registered; the integer codes are kept
+        # so that the fitting routines need not look them up again
+        self._penalty_type = self._get_penalty_type(self.penalty)
+        self._learning_rate_type = self._get_learning_rate_type(
+            self.learning_rate)
 
         if self.loss not in self.loss_functions:
             raise ValueError("The loss %s is not supported. " % self.loss)
@@ -134,6 +146,25 @@ class BaseSGD(six.with_metaclass(ABCMeta, BaseEstimator, SparseCoefMixin)):
         except KeyError:
             raise ValueError("The loss %s is not supported. " % loss)
 
+    def _get_fit_params(self, loss, learning_rate):
+        """Get the loss function and penalty / learning rate codes for fit.
+
+        The codes resolved by ``_validate_params`` are reused and the
+        ``LossFunction`` object is kept across calls as long as ``loss``
+        and ``epsilon`` do not change.
+        """
+        key = (loss, self.epsilon)
+        cache = getattr(self, "_loss_function_cache", None)
+        if cache is None or cache[0] != key:
+            cache = (key, self._get_loss_function(loss))
+            self._loss_function_cache = cache
+
+        if learning_rate == self.learning_rate:
+            learning_rate_type = self._learning_rate_type
+        else:
+            learning_rate_type = self._get_learning_rate_type(learning_rate)
+        return cache[1], self._penalty_type, learning_rate_type
+
     def _get_learning_rate_type(self, learning_rate):
         try:
             return LEARNING_RATE_TYPES[learning_rate]
@@ -177,7 +208,9 @@ class BaseSGD(six.with_metaclass(ABCMeta, BaseEstimator, SparseCoefMixin)):
 
             # allocate intercept_ for multi-class
             if intercept_init is not None:
-                intercept_init = np.asarray(intercept_init, order="C")
+                # copy: intercept_ is updated in place during fitting
+                intercept_init = np.array(intercept_init, dtype=np.float64,
+                                          order="C")
                 if intercept_init.shape != (n_classes, ):
                     raise ValueError("Provided intercept_init "
                                      "does not match dataset.")
@@ -200,7 +233,8 @@ class BaseSGD(six.with_metaclass(ABCMeta, BaseEstimator, SparseCoefMixin)):
 
             # allocate intercept_ for binary problem
             if intercept_init is not None:
-                intercept_init = np.asarray(intercept_init, dtype=np.float64)
+                # copy: intercept_ is updated in place during fitting
+                intercept_init = np.array(intercept_init, dtype=np.float64)
                 if intercept_init.shape != (1,) and intercept_init.shape != ():
                     raise ValueError("Provided intercept_init "
                                      "does not match dataset.")
@@ -231,13 +265,18 @@ def _make_dataset(X, y_i, sample_weight):
     return dataset, intercept_decay
 
 
-def _prepare_fit_binary(est, y, i):
+def _prepare_fit_binary(est, y_ind, i):
     """Initialization for fit_binary.
 
+    ``y_ind`` holds the index of the class of each sample in
+    ``est.classes_``; comparing it to ``i`` avoids comparing the
+    (possibly object-typed) labels themselves.
+
     Returns y, coef, intercept.
     """
-    y_i = np.ones(y.shape, dtype=np.float64, order="C")
-    y_i[y != est.classes_[i]] = -1.0
+    y_i = (y_ind == i).astype(np.float64)
+    y_i *= 2.
+    y_i -= 1.
 
     if len(est.classes_) == 2:
         coef = est.coef_.ravel()
@@ -249,19 +288,31 @@ def _prepare_fit_binary(est, y, i):
     return y_i, coef, intercept
 
 
-def fit_binary(est, i, X, y, alpha, C, learning_rate, n_iter,
-               pos_weight, neg_weight, sample_weight):
+def _is_memmap_backed(a):
+    """Whether ``a`` is a ``np.memmap`` or a view on one."""
+    while a is not None:
+        if isinstance(a, np.memmap):
+            return True
+        a = getattr(a, 'base', None)
+    return False
+
+
+def fit_binary(est, i, X, y_ind, alpha, C, penalty_type, learning_rate_type,
+               n_iter, pos_weight, neg_weight, sample_weight):
     """Fit a single binary classifier.
 
-    The i'th class is considered the "positive" class.
+    The i'th class is considered the "positive" class; ``y_ind`` holds the
+    index of the class of each sample in ``est.classes_``. The shapes of
+    ``X``, ``y_ind`` and ``sample_weight`` are checked by the caller.
     """
-    y_i, coef, intercept = _prepare_fit_binary(est, y, i)
-    assert y_i.shape[0] == y.shape[0] == sample_weight.shape[0]
+    y_i, coef, intercept = _prepare_fit_binary(est, y_ind, i)
+    if _is_memmap_backed(coef):
+        # In an OvA worker, a large coef_ is a copy-on-write memmap: the
+        # trained values would be sent back as a reference to the file,
+        # i.e. to the untrained coefficients. Train an in-memory copy.
+        coef = np.array(coef)
     dataset, intercept_decay = _make_dataset(X, y_i, sample_weight)
 
-    penalty_type = est._get_penalty_type(est.penalty)
-    learning_rate_type = est._get_learning_rate_type(learning_rate)
-
     return plain_sgd(coef, intercept, est.loss_function,
                      penalty_type, alpha, C, est.l1_ratio,
                      dataset, n_iter, int(est.fit_intercept),
@@ -336,7 +387,7 @@ class BaseSGDClassifier(six.with_metaclass(ABCMeta, BaseSGD,
         n_classes = self.classes_.shape[0]
 
         # Allocate datastructures from input arguments
-        y_ind = np.searchsorted(self.classes_, y)   # XXX use a LabelBinarizer?
+        y_ind = self._encode_labels(y)   # XXX use a LabelBinarizer?
         self._expanded_class_weight = compute_class_weight(self.class_weight,
                                                            self.classes_,
                                                            y_ind)
@@ -346,18 +397,22 @@ class BaseSGDClassifier(six.with_metaclass(ABCMeta, BaseSGD,
             self._allocate_parameter_mem(n_classes, n_features,
                                          coef_init, intercept_init)
 
-        self.loss_function = self._get_loss_function(loss)
+        # resolved once here rather than once per binary problem
+        self.loss_function, penalty_type, learning_rate_type = \
+            self._get_fit_params(loss, learning_rate)
         if self.t_ is None:
             self._init_t(self.loss_function)
 
         # delegate to concrete training procedure
         if n_classes > 2:
-            self._fit_multiclass(X, y, alpha=alpha, C=C,
-                                 learning_rate=learning_rate,
+            self._fit_multiclass(X, y_ind, alpha=alpha, C=C,
+                                 penalty_type=penalty_type,
+                                 learning_rate_type=learning_rate_type,
                                  sample_weight=sample_weight, n_iter=n_iter)
         elif n_classes == 2:
-            self._fit_binary(X, y, alpha=alpha, C=C,
-                             learning_rate=learning_rate,
+            self._fit_binary(X, y_ind, alpha=alpha, C=C,
+                             penalty_type=penalty_type,
+                             learning_rate_type=learning_rate_type,
                              sample_weight=sample_weight, n_iter=n_iter)
         else:
             raise ValueError("The number of class labels must be "
@@ -367,6 +422,47 @@ class BaseSGDClassifier(six.with_metaclass(ABCMeta, BaseSGD,
 
         return self
 
+    def _encode_labels(self, y):
+        """Return the index in ``classes_`` of each label in ``y``.
+
+        Integer classes spanning a small range are mapped through a dense
+        lookup table; other labels are located with a binary search.
+        Raises ValueError if ``y`` contains labels not in ``classes_``.
+        """
+        classes = self.classes_
+        n_classes = classes.shape[0]
+        # offsets are computed in intp: the labels' own dtype may be too
+        # narrow for them (e.g. int8 classes spanning more than 127)
+        if (classes.dtype.kind in "iu" and y.dtype.kind in "iu"
+                and np.can_cast(classes.dtype, np.intp)
+                and np.can_cast(y.dtype, np.intp)):
+            # classes_ is sorted
+            cmin, cmax = int(classes[0]), int(classes[-1])
+            if cmax - cmin < _LABEL_LUT_RANGE_FACTOR * n_classes:
+                # the table is small enough to be rebuilt at each call
+                lut = np.empty(cmax - cmin + 1, dtype=np.intp)
+                lut.fill(-1)
+                lut[classes.astype(np.intp) - cmin] = np.arange(n_classes)
+                offsets = y.astype(np.intp) - cmin
+                if offsets.shape[0] > 0 and (offsets.min() >= 0 and
+                                             offsets.max() <= cmax - cmin):
+                    y_ind = lut.take(offsets)
+                    if y_ind.min() >= 0:
+                        return y_ind
+                self._check_labels(y)
+
+        y_ind = np.searchsorted(classes, y)
+        if np.any(classes.take(y_ind, mode="clip") != y):
+            self._check_labels(y)
+        return y_ind
+
+    def _check_labels(self, y):
+        """Raise ValueError if ``y`` contains labels not in ``classes_``."""
+        unknown = np.setdiff1d(y, self.classes_)
+        if unknown.shape[0] > 0:
+            raise ValueError("y contains labels not in classes_: %r"
+                             % unknown)
+
     def _fit(self, X, y, alpha, C, loss, learning_rate,
              coef_init=None, intercept_init=None, class_weight=None,
              sample_weight=None):
@@ -405,11 +501,11 @@ class BaseSGDClassifier(six.with_metaclass(ABCMeta, BaseSGD,
 
         return self
 
-    def _fit_binary(self, X, y, alpha, C, sample_weight,
-                    learning_rate, n_iter):
-        """Fit a binary classifier on X and y. """
-        coef, intercept = fit_binary(self, 1, X, y, alpha, C,
-                                     learning_rate, n_iter,
+    def _fit_binary(self, X, y_ind, alpha, C, sample_weight,
+                    penalty_type, learning_rate_type, n_iter):
+        """Fit a binary classifier on X and the encoded labels y_ind. """
+        coef, intercept = fit_binary(self, 1, X, y_ind, alpha, C,
+                                     penalty_type, learning_rate_type, n_iter,
                                      self._expanded_class_weight[1],
                                      self._expanded_class_weight[0],
                                      sample_weight)
@@ -418,17 +514,22 @@ class BaseSGDClassifier(six.with_metaclass(ABCMeta, BaseSGD,
         # intercept is a float, need to convert it to an array of length 1
         self.intercept_ = np.atleast_1d(intercept)
 
-    def _fit_multiclass(self, X, y, alpha, C, learning_rate,
-                        sample_weight, n_iter):
+    def _fit_multiclass(self, X, y_ind, alpha, C, penalty_type,
+                        learning_rate_type, sample_weight, n_iter):
         """Fit a multi-class classifier by combining binary classifiers
 
         Each binary classifier predicts one class versus all others. This
         strategy is called OVA: One Versus All.
         """
-        # Use joblib to fit OvA in parallel
-        result = Parallel(n_jobs=self.n_jobs, verbose=self.verbose)(
-            delayed(fit_binary)(self, i, X, y, alpha, C, learning_rate,
-                                n_iter, self._expanded_class_weight[i], 1.,
+        # Use joblib to fit OvA in parallel. Arrays larger than max_nbytes
+        # (in particular the buffers of X and sample_weight) are dumped once
+        # to a memory-mapped file shared by the workers instead of being
+        # pickled again for every class.
+        result = Parallel(n_jobs=self.n_jobs, verbose=self.verbose,
+                          max_nbytes=_OVA_MAX_NBYTES)(
+            delayed(fit_binary)(self, i, X, y_ind, alpha, C, penalty_type,
+                                learning_rate_type, n_iter,
+                                self._expanded_class_weight[i], 1.,
                                 sample_weight)
             for i in range(len(self.classes_)))
 
@@ -689,35 +790,30 @@ class SGDClassifier(BaseSGDClassifier, _LearntSelectorMixin):
             return self._predict_proba_lr(X)
 
         elif self.loss == "modified_huber":
-            binary = (len(self.classes_) == 2)
-            scores = self.decision_function(X)
-
-            if binary:
-                prob2 = np.ones((scores.shape[0], 2))
-                prob = prob2[:, 1]
-            else:
-                prob = scores
-
-            np.clip(scores, -1, 1, prob)
-            prob += 1.
-            prob /= 2.
-
-            if binary:
-                prob2[:, 0] -= prob
-                prob = prob2
-            else:
-                # the above might assign zero to all classes, which doesn't
-                # normalize neatly; work around this to produce uniform
-                # probabilities
-                prob_sum = prob.sum(axis=1)
-                all_zero = (prob_sum == 0)
-                if np.any(all_zero):
-                    prob[all_zero, :] = 1
-                    prob_sum[all_zero] = len(self.classes_)
-
-                # normalize
-                prob /= prob_sum.reshape((prob.shape[0], -1))
-
+            X = atleast2d_or_csr(X)
+            n_samples = X.shape[0]
+            n_classes = len(self.classes_)
+            # work on batches of rows so that the scores stay in cache
+            # through the whole clip / normalize sequence
+            batch_size = max(1, _PROBA_BATCH_NBYTES // (8 * n_classes))
+            if n_samples <= batch_size:
+                return self._predict_proba_modified_huber(X)
+
+            coef_T = None
+            if sp.issparse(X) and not sp.issparse(self.coef_):
+                # a sparse product copies coef_.T to C order: make that
+                # copy once for all batches instead of once per batch
+                n_features = self.coef_.shape[1]
+                if X.shape[1] != n_features:
+                    raise ValueError("X has %d features per sample; "
+                                     "expecting %d"
+                                     % (X.shape[1], n_features))
+                coef_T = np.ascontiguousarray(self.coef_.T)
+
+            prob = np.empty((n_samples, n_classes))
+            for batch in gen_batches(n_samples, batch_size):
+                prob[batch] = self._predict_proba_modified_huber(X[batch],
+                                                                 coef_T)
             return prob
 
         else:
@@ -725,6 +821,52 @@ class SGDClassifier(BaseSGDClassifier, _LearntSelectorMixin):
                                       " loss='log' or loss='modified_huber' "
                                       "(%r given)" % self.loss)
 
+    def _predict_proba_modified_huber(self, X, coef_T=None):
+        """Probability estimates for loss="modified_huber".
+
+        ``coef_T``, if given, is a C-contiguous copy of ``coef_.T`` that
+        is used instead of ``decision_function`` on (sparse) ``X``.
+        """
+        binary = (len(self.classes_) == 2)
+        if coef_T is None:
+            scores = self.decision_function(X)
+        else:
+            scores = safe_sparse_dot(X, coef_T, dense_output=True)
+            scores += self.intercept_
+            if binary:
+                scores = scores.ravel()
+
+        if binary:
+            # do the arithmetic on a contiguous array and only write the
+            # strided columns of the result once
+            prob = np.clip(scores, -1, 1)
+            prob += 1.
+            prob /= 2.
+            prob2 = np.empty((prob.shape[0], 2))
+            prob2[:, 1] = prob
+            np.subtract(1., prob, prob2[:, 0])
+            return prob2
+
+        prob = scores
+        np.clip(scores, -1, 1, prob)
+        prob += 1.
+
+        # dividing by 2 as in the binary case is not needed since the rows
+        # are normalized below.
+        # the above might assign zero to all classes, which doesn't
+        # normalize neatly; work around this to produce uniform
+        # probabilities
+        prob_sum = prob.sum(axis=1)
+        all_zero = (prob_sum == 0)
+        if np.any(all_zero):
+            prob[all_zero, :] = 1
+            prob_sum[all_zero] = len(self.classes_)
+
+        # normalize
+        prob /= prob_sum.reshape((prob.shape[0], -1))
+
+        return prob
+
     def predict_log_proba(self, X):
         """Log of probability estimates.
 
@@ -742,7 +884,9 @@ class SGDClassifier(BaseSGDClassifier, _LearntSelectorMixin):
             model, where classes are ordered as they are in
             `self.classes_`.
         """
-        return np.log(self.predict_proba(X))
+        prob = self.predict_proba(X)
+        # predict_proba returns a fresh array: take the log in place
+        return np.log(prob, prob)
 
 
 class BaseSGDRegressor(BaseSGD, RegressorMixin):
@@ -884,7 +1028,12 @@ class BaseSGDRegressor(BaseSGD, RegressorMixin):
         array, shape = [n_samples]
            Predicted target values per element in X.
         """
-        X = atleast2d_or_csr(X)
+        if sp.isspmatrix_csc(X):
+            # CSC has its own matrix-vector product; converting it to CSR
+            # would only add a pass over X
+            X = atleast2d_or_csc(X)
+        else:
+            X = atleast2d_or_csr(X)
         scores = safe_sparse_dot(X, self.coef_.T,
                                  dense_output=True) + self.intercept_
         return scores.ravel()
@@ -907,9 +1056,8 @@ class BaseSGDRegressor(BaseSGD, RegressorMixin):
                        sample_weight, n_iter):
         dataset, intercept_decay = _make_dataset(X, y, sample_weight)
 
-        loss_function = self._get_loss_function(loss)
-        penalty_type = self._get_penalty_type(self.penalty)
-        learning_rate_type = self._get_learning_rate_type(learning_rate)
+        loss_function, penalty_type, learning_rate_type = \
+            self._get_fit_params(loss, learning_rate)
 
         if self.t_ is None:
             self._init_t(loss_function)
@@ -931,7 +1079,7 @@ class BaseSGDRegressor(BaseSGD, RegressorMixin):
                                           self.eta0, self.power_t, self.t_,
                                           intercept_decay)
 
-        self.intercept_ = np.atleast_1d(intercept)
+        self.intercept_[0] = intercept
 
 
 class SGDRegressor(BaseSGDRegressor, _LearntSelectorMixin):
@@ -9,11 +9,14 @@ from sklearn.utils.testing import assert_array_equal
 from sklearn.utils.testing import assert_greater
 from sklearn.utils.testing import assert_raises
 from sklearn.utils.testing import ignore_warnings
+from sklearn.utils.testing import assert_warns
+from sklearn.utils.testing import assert_no_warnings
 
 from sklearn import datasets
 from sklearn.metrics import mean_squared_error
 from sklearn.metrics.scorer import SCORERS
 
+from sklearn.linear_model import ridge
 from sklearn.linear_model.base import LinearRegression
 from sklearn.linear_model.ridge import ridge_regression
 from sklearn.linear_model.ridge import Ridge
@@ -445,6 +448,25 @@ def test_class_weights_cv():
     assert_array_equal(clf.predict([[-.2, 2]]), np.array([-1]))
 
 
+def test_class_weights_cv_fit_deprecation_warned_once():
+    """
+    Test the deprecated class_weight fit parameter warns only once.
+    """
+    X = np.array([[-1.0, -1.0], [-1.0, 0], [-.8, -1.0],
+                  [1.0, 1.0], [1.0, 0.0]])
+    y = [1, 1, 1, -1, -1]
+
+    warned = ridge._WARNED_CW_FIT
+    ridge._WARNED_CW_FIT = False
+    try:
+        clf = RidgeClassifierCV(alphas=[.01, .1, 1])
+        assert_warns(DeprecationWarning, clf.fit, X, y,
+                     class_weight={1: 0.001})
+        assert_no_warnings(clf.fit, X, y, class_weight={1: 0.001})
+    finally:
+        ridge._WARNED_CW_FIT = warned
+
+
 def test_ridgecv_store_cv_values():
     """
     Test _RidgeCV's store_cv_values attribute.
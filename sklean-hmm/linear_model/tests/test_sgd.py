@@ -17,7 +17,9 @@ from sklearn.utils.testing import assert_equal
 from sklearn import linear_model, datasets, metrics
 from sklearn.base import clone
 from sklearn.linear_model import SGDClassifier, SGDRegressor
+from sklearn.linear_model import stochastic_gradient
 from sklearn.preprocessing import LabelEncoder, scale
+from sklearn.utils.extmath import safe_sparse_dot
 
 
 class SparseSGDClassifier(SGDClassifier):
@@ -280,6 +282,21 @@ class DenseSGDClassifierTestCase(unittest.TestCase, CommonTest):
         pred = clf.predict(T2)
         assert_array_equal(pred, true_result2)
 
+    def test_sgd_multiclass_njobs_memmapped_coef(self):
+        """Multi-class test case with a coef_ large enough to be memmapped"""
+        rng = np.random.RandomState(0)
+        n_samples, n_features = 60, 50000
+        # 3 * 50000 float64 coefficients: above the OvA memmapping threshold
+        X = np.zeros((n_samples, n_features))
+        for row in X:
+            row[rng.randint(n_features, size=10)] = rng.rand(10)
+        y = rng.randint(3, size=n_samples)
+        clf_1 = self.factory(alpha=0.01, n_iter=5, n_jobs=1).fit(X, y)
+        clf_2 = self.factory(alpha=0.01, n_iter=5, n_jobs=2).fit(X, y)
+        assert_true(np.any(clf_2.coef_ != 0))
+        assert_array_almost_equal(clf_1.coef_, clf_2.coef_)
+        assert_array_almost_equal(clf_1.intercept_, clf_2.intercept_)
+
     def test_set_coef_multiclass(self):
         """Checks coef_init and intercept_init shape for for multi-class
         problems"""
@@ -298,6 +315,31 @@ class DenseSGDClassifierTestCase(unittest.TestCase, CommonTest):
         # Provided intercept_ does match dataset.
         clf = self.factory().fit(X2, Y2, intercept_init=np.zeros((3,)))
 
+    def test_sparse_decision_function_coef_update(self):
+        """Sparse decision_function follows changes of coef_"""
+        clf = self.factory(alpha=0.01, n_iter=20).fit(X2, Y2)
+        X2_csr = sp.csr_matrix(X2)
+        dense = clf.decision_function(X2)
+        assert_array_almost_equal(SGDClassifier.decision_function(clf, X2_csr),
+                                  dense)
+
+        clf.sparsify()
+        assert_array_almost_equal(SGDClassifier.decision_function(clf, X2_csr),
+                                  dense)
+
+        clf.densify()
+        clf.coef_ = clf.coef_ * 2.
+        assert_array_almost_equal(
+            SGDClassifier.decision_function(clf, X2_csr),
+            safe_sparse_dot(X2, clf.coef_.T) + clf.intercept_)
+
+        # in-place updates of coef_ are seen as well
+        clf.coef_ *= 2.
+        clf.coef_[0] = 0.
+        assert_array_almost_equal(
+            SGDClassifier.decision_function(clf, X2_csr),
+            safe_sparse_dot(X2, clf.coef_.T) + clf.intercept_)
+
     def test_sgd_proba(self):
         """Check SGD.predict_proba"""
 
@@ -362,6 +404,23 @@ class DenseSGDClassifierTestCase(unittest.TestCase, CommonTest):
             p = clf.predict_proba(x)
             assert_array_almost_equal(p[0], [1/3.] * 3)
 
+    def test_sgd_proba_batches(self):
+        """predict_proba gives the same result when computed in batches"""
+        for X_, Y_ in [(X, Y), (X2, Y2)]:
+            clf = self.factory(loss="modified_huber", alpha=0.01, n_iter=10)
+            clf.fit(X_, Y_)
+            p = clf.predict_proba(X_)
+
+            old_nbytes = stochastic_gradient._PROBA_BATCH_NBYTES
+            stochastic_gradient._PROBA_BATCH_NBYTES = 8 * 2 * len(clf.classes_)
+            try:
+                assert_array_almost_equal(clf.predict_proba(X_), p)
+                # sparse input shares one transposed coef_ across batches
+                assert_array_almost_equal(
+                    clf.predict_proba(sp.csr_matrix(X_)), p)
+            finally:
+                stochastic_gradient._PROBA_BATCH_NBYTES = old_nbytes
+
     def test_sgd_l1(self):
         """Test L1 regularization"""
         n = len(X4)
@@ -557,6 +616,40 @@ class DenseSGDClassifierTestCase(unittest.TestCase, CommonTest):
         # check that coef_ haven't been re-allocated
         assert_true(id1, id2)
 
+    def test_partial_fit_integer_labels(self):
+        """Integer and string labels give the same model"""
+        classes = np.array([-3, 5, 12])
+        y_int = classes[LabelEncoder().fit_transform(Y2)]
+        clf = self.factory(alpha=0.01)
+        clf.partial_fit(X2, y_int, classes=classes)
+        clf.partial_fit(X2, y_int)
+        clf_str = self.factory(alpha=0.01)
+        clf_str.partial_fit(X2, Y2, classes=np.unique(Y2))
+        clf_str.partial_fit(X2, Y2)
+        assert_array_almost_equal(clf.coef_, clf_str.coef_)
+        assert_array_equal(clf.predict(X2),
+                           classes[np.searchsorted(clf_str.classes_,
+                                                   clf_str.predict(X2))])
+
+        # the range of these labels overflows their dtype
+        classes = np.array([-100, 0, 100], dtype=np.int8)
+        y_int8 = classes[LabelEncoder().fit_transform(Y2)]
+        clf = self.factory(alpha=0.01)
+        clf.partial_fit(X2, y_int8, classes=classes)
+        clf.partial_fit(X2, y_int8)
+        assert_array_almost_equal(clf.coef_, clf_str.coef_)
+
+        # labels not in classes are rejected, inside and outside the range
+        # of the classes
+        clf = self.factory(alpha=0.01)
+        clf.partial_fit(X2, y_int, classes=[-3, 5, 12])
+        for label in [7, 50, -10]:
+            y_bad = y_int.copy()
+            y_bad[0] = label
+            assert_raises(ValueError, clf.partial_fit, X2, y_bad)
+        y_bad = ["unknown"] + Y2[1:]
+        assert_raises(ValueError, clf_str.partial_fit, X2, y_bad)
+
     def test_fit_then_partial_fit(self):
         """Partial_fit should work after initial fit in the multiclass case.
 
@@ -801,6 +894,15 @@ class DenseSGDRegressorTestCase(unittest.TestCase, CommonTest):
     def test_partial_fit_equal_fit_invscaling(self):
         self._test_partial_fit_equal_fit("invscaling")
 
+    def test_decision_function_sparse_formats(self):
+        """CSC and CSR input give the same predictions"""
+        clf = self.factory(alpha=0.01, n_iter=20).fit(X, Y)
+        pred = SGDRegressor.decision_function(clf, sp.csr_matrix(T))
+        assert_array_almost_equal(
+            SGDRegressor.decision_function(clf, sp.csc_matrix(T)), pred)
+        assert_array_almost_equal(SGDRegressor.decision_function(clf, T),
+                                  pred)
+
     def test_loss_function_epsilon(self):
         clf = self.factory(epsilon=0.9)
         clf.set_params(epsilon=0.1)
@@ -72,10 +72,12 @@ class MockClassifier(BaseEstimator):
                         ' is {0}, should be {1}'.format(sample_weight.shape[0],
                                                         X.shape[0]))
         if class_prior is not None:
-            assert_true(class_prior.shape[0] == len(np.unique(y)),
+            # compared against the classes of the whole dataset: a training
+            # fold does not necessarily contain every class
+            assert_true(class_prior.shape[0] == N_CLASSES,
                         'MockClassifier extra fit_param class_prior.shape[0]'
                         ' is {0}, should be {1}'.format(class_prior.shape[0],
-                                                        len(np.unique(y))))
+                                                        N_CLASSES))
         return self
 
     def predict(self, T):
@@ -88,20 +90,30 @@ class MockClassifier(BaseEstimator):
 X = np.ones((10, 2))
 X_sparse = coo_matrix(X)
 y = np.arange(10) // 2
+N_CLASSES = len(np.unique(y))
+
+iris = load_iris()
 
 ##############################################################################
 # Tests
 
 def check_valid_split(train, test, n_samples=None):
-    # Use python sets to get more informative assertion failure messages
-    train, test = set(train), set(test)
-
-    # Train and test split should not overlap
-    assert_equal(train.intersection(test), set())
+    train, test = np.asarray(train), np.asarray(test)
+    size = n_samples
+    if size is None:
+        size = np.concatenate((train, test)).max() + 1
+    train_mask = np.zeros(size, dtype=np.bool)
+    train_mask[train] = True
+    test_mask = np.zeros(size, dtype=np.bool)
+    test_mask[test] = True
+
+    # Train and test split should not overlap; compare index arrays rather
+    # than booleans to get more informative assertion failure messages
+    assert_array_equal(np.flatnonzero(train_mask & test_mask), [])
 
     if n_samples is not None:
         # Check that the union of train an test split cover all the indices
-        assert_equal(train.union(test), set(range(n_samples)))
+        assert_array_equal(np.flatnonzero(~(train_mask | test_mask)), [])
 
 
 def check_cv_coverage(cv, expected_n_iter=None, n_samples=None):
@@ -111,17 +123,19 @@ def check_cv_coverage(cv, expected_n_iter=None, n_samples=None):
     else:
         expected_n_iter = len(cv)
 
-    collected_test_samples = set()
+    if n_samples is not None:
+        collected_test_samples = np.zeros(n_samples, dtype=np.bool)
     iterations = 0
     for train, test in cv:
         check_valid_split(train, test, n_samples=n_samples)
         iterations += 1
-        collected_test_samples.update(test)
+        if n_samples is not None:
+            collected_test_samples[test] = True
 
     # Check that the accumulated test samples cover the whole dataset
     assert_equal(iterations, expected_n_iter)
     if n_samples is not None:
-        assert_equal(collected_test_samples, set(range(n_samples)))
+        assert_array_equal(np.flatnonzero(~collected_test_samples), [])
 
 
 def test_kfold_valueerrors():
@@ -223,13 +237,12 @@ def test_stratified_kfold_ratios():
                       [0] * int(0.89 * n_samples) +
                       [1] * int(0.01 * n_samples))
 
+    expected_ratios = [0.10, 0.89, 0.01]
     for train, test in cval.StratifiedKFold(labels, 5):
-        assert_almost_equal(np.sum(labels[train] == 4) / len(train), 0.10, 2)
-        assert_almost_equal(np.sum(labels[train] == 0) / len(train), 0.89, 2)
-        assert_almost_equal(np.sum(labels[train] == 1) / len(train), 0.01, 2)
-        assert_almost_equal(np.sum(labels[test] == 4) / len(test), 0.10, 2)
-        assert_almost_equal(np.sum(labels[test] == 0) / len(test), 0.89, 2)
-        assert_almost_equal(np.sum(labels[test] == 1) / len(test), 0.01, 2)
+        train_ratios = np.bincount(labels[train], minlength=5) / len(train)
+        test_ratios = np.bincount(labels[test], minlength=5) / len(test)
+        assert_array_almost_equal(train_ratios[[4, 0, 1]], expected_ratios, 2)
+        assert_array_almost_equal(test_ratios[[4, 0, 1]], expected_ratios, 2)
 
 
 def test_kfold_balance():
@@ -262,7 +275,7 @@ def test_shuffle_kfold():
     kf = cval.KFold(300, 3, shuffle=True, random_state=0)
     ind = np.arange(300)
 
-    all_folds = None
+    test_folds = []
     for train, test in kf:
         sorted_array = np.arange(100)
         assert_true(np.any(sorted_array != ind[train]))
@@ -270,11 +283,9 @@ def test_shuffle_kfold():
         assert_true(np.any(sorted_array != ind[train]))
         sorted_array = np.arange(201, 300)
         assert_true(np.any(sorted_array != ind[train]))
-        if all_folds is None:
-            all_folds = ind[test].copy()
-        else:
-            all_folds = np.concatenate((all_folds, ind[test]))
+        test_folds.append(ind[test])
 
+    all_folds = np.concatenate(test_folds)
     all_folds.sort()
     assert_array_equal(all_folds, ind)
 
@@ -294,7 +305,7 @@ def test_kfold_can_detect_dependent_samples_on_digits():  # see #2372
     n = len(y)
 
     cv = cval.KFold(n, 5, shuffle=False)
-    mean_score = cval.cross_val_score(model, X, y, cv=cv).mean()
+    mean_score = cval.cross_val_score(model, X, y, cv=cv, n_jobs=2).mean()
     assert_greater(0.88, mean_score)
     assert_greater(mean_score, 0.85)
 
@@ -303,11 +314,11 @@ def test_kfold_can_detect_dependent_samples_on_digits():  # see #2372
     # by yielding a seriously overestimated score:
 
     cv = cval.KFold(n, 5, shuffle=True, random_state=0)
-    mean_score = cval.cross_val_score(model, X, y, cv=cv).mean()
+    mean_score = cval.cross_val_score(model, X, y, cv=cv, n_jobs=2).mean()
     assert_greater(mean_score, 0.95)
 
     cv = cval.KFold(n, 5, shuffle=True, random_state=1)
-    mean_score = cval.cross_val_score(model, X, y, cv=cv).mean()
+    mean_score = cval.cross_val_score(model, X, y, cv=cv, n_jobs=2).mean()
     assert_greater(mean_score, 0.95)
 
     # Similarly, StratifiedKFold should try to shuffle the data as little
@@ -318,24 +329,22 @@ def test_kfold_can_detect_dependent_samples_on_digits():  # see #2372
     # non-shuffled KFold
 
     cv = cval.StratifiedKFold(y, 5)
-    mean_score = cval.cross_val_score(model, X, y, cv=cv).mean()
+    mean_score = cval.cross_val_score(model, X, y, cv=cv, n_jobs=2).mean()
     assert_greater(0.88, mean_score)
     assert_greater(mean_score, 0.85)
 
 
 def test_shuffle_split():
-    ss1 = cval.ShuffleSplit(10, test_size=0.2, random_state=0)
-    ss2 = cval.ShuffleSplit(10, test_size=2, random_state=0)
-    ss3 = cval.ShuffleSplit(10, test_size=np.int32(2), random_state=0)
-    for typ in six.integer_types:
-        ss4 = cval.ShuffleSplit(10, test_size=typ(2), random_state=0)
-    for t1, t2, t3, t4 in zip(ss1, ss2, ss3, ss4):
-        assert_array_equal(t1[0], t2[0])
-        assert_array_equal(t2[0], t3[0])
-        assert_array_equal(t3[0], t4[0])
-        assert_array_equal(t1[1], t2[1])
-        assert_array_equal(t2[1], t3[1])
-        assert_array_equal(t3[1], t4[1])
+    # test_size given as a float and as every integer type (including long
+    # on Python 2) must select the same samples
+    test_sizes = [0.2, np.int32(2)] + [typ(2) for typ in six.integer_types]
+    splitters = [cval.ShuffleSplit(10, test_size=test_size, random_state=0)
+                 for test_size in test_sizes]
+    for splits in zip(*splitters):
+        train_ref, test_ref = splits[0]
+        for train, test in splits[1:]:
+            assert_array_equal(train, train_ref)
+            assert_array_equal(test, test_ref)
 
 
 def test_stratified_shuffle_split_init():
@@ -369,18 +378,22 @@ def test_stratified_shuffle_split_iter():
           ]
 
     for y in ys:
+        # encode the labels once so that class counts are a single bincount
+        classes, y_ind = unique(y, return_inverse=True)
         sss = cval.StratifiedShuffleSplit(y, 6, test_size=0.33,
                                           random_state=0)
         for train, test in sss:
-            assert_array_equal(unique(y[train]), unique(y[test]))
+            n_train = np.bincount(y_ind[train], minlength=len(classes))
+            n_test = np.bincount(y_ind[test], minlength=len(classes))
+            assert_array_equal(n_train > 0, n_test > 0)
             # Checks if folds keep classes proportions
-            p_train = (np.bincount(unique(y[train], return_inverse=True)[1]) /
-                       float(len(y[train])))
-            p_test = (np.bincount(unique(y[test], return_inverse=True)[1]) /
-                      float(len(y[test])))
+            p_train = n_train / float(len(train))
+            p_test = n_test / float(len(test))
             assert_array_almost_equal(p_train, p_test, 1)
             assert_equal(y[train].size + y[test].size, y.size)
-            assert_array_equal(np.lib.arraysetops.intersect1d(train, test), [])
+            train_mask = np.zeros(y.size, dtype=np.bool)
+            train_mask[train] = True
+            assert_array_equal(np.flatnonzero(train_mask[test]), [])
 
 
 @ignore_warnings
@@ -414,23 +427,21 @@ def test_leave_label_out_changing_labels():
 
 def test_cross_val_score():
     clf = MockClassifier()
+    # the folds only depend on the number of samples: build them once
+    cv = list(cval.KFold(len(y), 3))
     for a in range(-10, 10):
         clf.a = a
         # Smoke test
-        scores = cval.cross_val_score(clf, X, y)
+        scores = cval.cross_val_score(clf, X, y, cv=cv)
         assert_array_equal(scores, clf.score(X, y))
 
         # test with multioutput y
-        scores = cval.cross_val_score(clf, X_sparse, X)
+        scores = cval.cross_val_score(clf, X_sparse, X, cv=cv)
         assert_array_equal(scores, clf.score(X_sparse, X))
 
-        scores = cval.cross_val_score(clf, X_sparse, y)
+        scores = cval.cross_val_score(clf, X_sparse, y, cv=cv)
         assert_array_equal(scores, clf.score(X_sparse, y))
 
-        # test with multioutput y
-        scores = cval.cross_val_score(clf, X_sparse, X)
-        assert_array_equal(scores, clf.score(X_sparse, X))
-
     # test with X as list
     clf = MockListClassifier()
     scores = cval.cross_val_score(clf, X.tolist(), y)
@@ -442,7 +453,6 @@ def test_cross_val_score():
 def test_cross_val_score_precomputed():
     # test for svm with precomputed kernel
     svm = SVC(kernel="precomputed")
-    iris = load_iris()
     X, y = iris.data, iris.target
     linear_kernel = np.dot(X, X.T)
     score_precomputed = cval.cross_val_score(svm, linear_kernel, y)
@@ -463,9 +473,8 @@ def test_cross_val_score_precomputed():
 def test_cross_val_score_fit_params():
     clf = MockClassifier()
     n_samples = X.shape[0]
-    n_classes = len(np.unique(y))
     fit_params = {'sample_weight': np.ones(n_samples),
-                  'class_prior': np.ones(n_classes) / n_classes}
+                  'class_prior': np.ones(N_CLASSES) / N_CLASSES}
     cval.cross_val_score(clf, X, y, fit_params=fit_params)
 
 
@@ -522,7 +531,6 @@ def test_train_test_split():
 
 
 def test_cross_val_score_with_score_func_classification():
-    iris = load_iris()
     clf = SVC(kernel='linear')
 
     # Default score (should be the accuracy score)
@@ -575,12 +583,11 @@ def test_cross_val_score_with_score_func_regression():
 
 
 def test_permutation_score():
-    iris = load_iris()
     X = iris.data
-    X_sparse = coo_matrix(X)
+    X_sparse = coo_matrix(X).tocsr()
     y = iris.target
     svm = SVC(kernel='linear')
-    cv = cval.StratifiedKFold(y, 2)
+    cv = list(cval.StratifiedKFold(y, 2))
 
     score, scores, pvalue = cval.permutation_test_score(
         svm, X, y, cv=cv, scoring="accuracy")
@@ -603,9 +610,8 @@ def test_permutation_score():
 
     # check that we obtain the same results with a sparse representation
     svm_sparse = SVC(kernel='linear')
-    cv_sparse = cval.StratifiedKFold(y, 2)
     score_label, _, pvalue_label = cval.permutation_test_score(
-        svm_sparse, X_sparse, y, cv=cv_sparse,
+        svm_sparse, X_sparse, y, cv=cv,
         scoring="accuracy", labels=np.ones(y.size), random_state=0)
 
     assert_true(score_label == score)
@@ -727,8 +733,14 @@ def test_cross_val_generator_mask_indices_same():
                             (lolo_mask, lolo_ind), (lopo_mask, lopo_ind)]:
         for (train_mask, test_mask), (train_ind, test_ind) in \
                 zip(cv_mask, cv_ind):
-            assert_array_equal(np.where(train_mask)[0], train_ind)
-            assert_array_equal(np.where(test_mask)[0], test_ind)
+            # scatter the indices into the expected masks, which also checks
+            # that the masks span every sample
+            expected_mask = np.zeros(len(train_mask), dtype=np.bool)
+            expected_mask[train_ind] = True
+            assert_array_equal(train_mask, expected_mask)
+            expected_mask[:] = False
+            expected_mask[test_ind] = True
+            assert_array_equal(test_mask, expected_mask)
 
 
 def test_bootstrap_errors():
@@ -769,16 +781,12 @@ def test_cross_indices_exception():
     X = coo_matrix(np.array([[1, 2], [3, 4], [5, 6], [7, 8]]))
     y = np.array([1, 1, 2, 2])
     labels = np.array([1, 2, 3, 4])
-    loo = cval.LeaveOneOut(4, indices=False)
-    lpo = cval.LeavePOut(4, 2, indices=False)
-    kf = cval.KFold(4, 2, indices=False)
-    skf = cval.StratifiedKFold(y, 2, indices=False)
-    lolo = cval.LeaveOneLabelOut(labels, indices=False)
-    lopo = cval.LeavePLabelOut(labels, 2, indices=False)
-
-    assert_raises(ValueError, cval.check_cv, loo, X, y)
-    assert_raises(ValueError, cval.check_cv, lpo, X, y)
-    assert_raises(ValueError, cval.check_cv, kf, X, y)
-    assert_raises(ValueError, cval.check_cv, skf, X, y)
-    assert_raises(ValueError, cval.check_cv, lolo, X, y)
-    assert_raises(ValueError, cval.check_cv, lopo, X, y)
+    splitters = [cval.LeaveOneOut(4, indices=False),
+                 cval.LeavePOut(4, 2, indices=False),
+                 cval.KFold(4, 2, indices=False),
+                 cval.StratifiedKFold(y, 2, indices=False),
+                 cval.LeaveOneLabelOut(labels, indices=False),
+                 cval.LeavePLabelOut(labels, 2, indices=False)]
+
+    for cv in splitters:
+        assert_raises(ValueError, cval.check_cv, cv, X, y)
@@ -80,6 +80,28 @@ def _assert_greater(a, b, msg=None):
 
 
 
+def _call_and_record_warnings(func, *args, **kw):
+    """Call func with all warnings recorded, return (result, warnings)."""
+    # very important to avoid uncontrolled state propagation
+    clean_warning_registry()
+    with warnings.catch_warnings(record=True) as w:
+        # Cause all warnings to always be triggered.
+        warnings.simplefilter("always")
+        result = func(*args, **kw)
+    return result, w
+
+
+def _check_first_warning(w, warning_class, func):
+    if not len(w) > 0:
+        raise AssertionError("No warning raised when calling %s"
+                             % func.__name__)
+
+    if not w[0].category is warning_class:
+        raise AssertionError("First warning for %s is not a "
+                             "%s( is %s)"
+                             % (func.__name__, warning_class, w[0]))
+
+
 # To remove when we support numpy 1.7
 def assert_warns(warning_class, func, *args, **kw):
     """Test that a certain warning occurs.
@@ -102,29 +124,12 @@ def assert_warns(warning_class, func, *args, **kw):
     result : the return value of `func`
 
     """
-
-    # very important to avoid uncontrolled state propagation
-    clean_warning_registry()
-    with warnings.catch_warnings(record=True) as w:
-        # Cause all warnings to always be triggered.
-        warnings.simplefilter("always")
-        # Trigger a warning.
-        result = func(*args, **kw)
-        # Verify some things
-        if not len(w) > 0:
-            raise AssertionError("No warning raised when calling %s"
-                                 % func.__name__)
-
-        if not w[0].category is warning_class:
-            raise AssertionError("First warning for %s is not a "
-                                 "%s( is %s)"
-                                 % (func.__name__, warning_class, w[0]))
-
+    result, w = _call_and_record_warnings(func, *args, **kw)
+    _check_first_warning(w, warning_class, func)
     return result
 
 
 def assert_warns_message(warning_class, message, func, *args, **kw):
-    # very important to avoid uncontrolled state propagation
     """Test that a certain warning occurs and with a certain message.
 
     Parameters
@@ -150,34 +155,21 @@ def assert_warns_message(warning_class, message, func, *args, **kw):
     result : the return value of `func`
 
     """
-    clean_warning_registry()
-    with warnings.catch_warnings(record=True) as w:
-        # Cause all warnings to always be triggered.
-        warnings.simplefilter("always")
-        # Trigger a warning.
-        result = func(*args, **kw)
-        # Verify some things
-        if not len(w) > 0:
-            raise AssertionError("No warning raised when calling %s"
-                                 % func.__name__)
-
-        if not w[0].category is warning_class:
-            raise AssertionError("First warning for %s is not a "
-                                 "%s( is %s)"
-                                 % (func.__name__, warning_class, w[0]))
-
-        # substring will match, the entire message with typo won't
-        msg = w[0].message  # For Python 3 compatibility
-        msg = str(msg.args[0] if hasattr(msg, 'args') else msg)
-        if callable(message):  # add support for certain tests
-            check_in_message = message
-        else:
-            check_in_message = lambda msg : message in msg
-        if not check_in_message(msg):
-            raise AssertionError("The message received ('%s') for <%s> is "
-                                 "not the one you expected ('%s')"
-                                 % (msg, func.__name__,  message
-                                 ))
+    result, w = _call_and_record_warnings(func, *args, **kw)
+    _check_first_warning(w, warning_class, func)
+
+    # substring will match, the entire message with typo won't
+    msg = w[0].message  # For Python 3 compatibility
+    msg = str(msg.args[0] if hasattr(msg, 'args') else msg)
+    if callable(message):  # add support for certain tests
+        check_in_message = message
+    else:
+        check_in_message = lambda msg : message in msg
+    if not check_in_message(msg):
+        raise AssertionError("The message received ('%s') for <%s> is "
+                             "not the one you expected ('%s')"
+                             % (msg, func.__name__,  message
+                             ))
     return result
 
 
@@ -186,22 +178,17 @@ def assert_no_warnings(func, *args, **kw):
     # XXX: once we may depend on python >= 2.6, this can be replaced by the
 
     # warnings module context manager.
-    # very important to avoid uncontrolled state propagation
-    clean_warning_registry()
-    with warnings.catch_warnings(record=True) as w:
-        warnings.simplefilter('always')
-
-        result = func(*args, **kw)
-        if len(w) > 0:
-            raise AssertionError("Got warnings when calling %s: %s"
-                                 % (func.__name__, w))
+    result, w = _call_and_record_warnings(func, *args, **kw)
+    if len(w) > 0:
+        raise AssertionError("Got warnings when calling %s: %s"
+                             % (func.__name__, w))
     return result
 
 
 def ignore_warnings(obj=None):
     """ Context manager and decorator to ignore warnings
 
-    Note. Using this (in both variants) will clear all warnings
+    Note. Using the context manager will clear all warnings
     from all python modules loaded. In case you need to test
     cross-module-warning-logging this is not your tool of choice.
 
@@ -228,12 +215,13 @@ def _ignore_warnings(fn):
     """Decorator to catch and hide warnings without visual nesting"""
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        # very important to avoid uncontrolled state propagation
-        clean_warning_registry()
-        with warnings.catch_warnings(record=True) as w:
+        # Swallow the warnings into a discarded log under an 'always'
+        # filter rather than using 'ignore': on Python 2 and 3.3 an ignored
+        # warning is written to its module's __warningregistry__, which
+        # would hide it from later tests expecting it.
+        with warnings.catch_warnings(record=True):
             warnings.simplefilter('always')
             return fn(*args, **kwargs)
-            w[:] = []
 
     return wrapper
 
@@ -346,11 +334,11 @@ def fake_mldata(columns_dict, dataname, matfile, ordering=None):
     Note: this function transposes all arrays, while fetch_mldata only
     transposes 'data', keep that into account in the tests.
     """
-    datasets = dict(columns_dict)
-
-    # transpose all variables
-    for name in datasets:
-        datasets[name] = datasets[name].T
+    # transpose all variables; .T is a view, and the transposed C-ordered
+    # arrays are Fortran-contiguous, which is the layout savemat writes, so
+    # no copy is made before serialization
+    datasets = dict((name, np.asarray(value).T)
+                    for name, value in columns_dict.items())
 
     if ordering is None:
         ordering = sorted(list(datasets.keys()))
@@ -380,22 +368,27 @@ class mock_mldata_urlopen(object):
         returns it. Otherwise, it raises an HTTPError.
         """
         self.mock_datasets = mock_datasets
+        # serialized matfile contents, built on the first request of each
+        # dataset
+        self._matfile_cache = {}
 
     def __call__(self, urlname):
         dataset_name = urlname.split('/')[-1]
         if dataset_name in self.mock_datasets:
-            resource_name = '_' + dataset_name
             from io import BytesIO
-            matfile = BytesIO()
-
-            dataset = self.mock_datasets[dataset_name]
-            ordering = None
-            if isinstance(dataset, tuple):
-                dataset, ordering = dataset
-            fake_mldata(dataset, resource_name, matfile, ordering)
-
-            matfile.seek(0)
-            return matfile
+            if dataset_name not in self._matfile_cache:
+                resource_name = '_' + dataset_name
+                matfile = BytesIO()
+
+                dataset = self.mock_datasets[dataset_name]
+                ordering = None
+                if isinstance(dataset, tuple):
+                    dataset, ordering = dataset
+                fake_mldata(dataset, resource_name, matfile, ordering)
+                self._matfile_cache[dataset_name] = matfile.getvalue()
+
+            # every request gets its own file object positioned at the start
+            return BytesIO(self._matfile_cache[dataset_name])
         else:
             raise HTTPError(urlname, 404, dataset_name + " is not available",
                             [], None)
@@ -420,6 +413,60 @@ meta_estimators = ["OneVsOneClassifier",
 # estimators that there is no way to default-construct sensibly
 other = ["Pipeline", "FeatureUnion", "GridSearchCV", "RandomizedSearchCV"]
 
+# mixin that estimators must inherit from for each all_estimators type_filter
+_TYPE_FILTER_MIXINS = {'classifier': ClassifierMixin,
+                       'regressor': RegressorMixin,
+                       'transformer': TransformerMixin,
+                       'cluster': ClusterMixin}
+
+# all_estimators results, keyed by the arguments of the call
+_ALL_ESTIMATORS_CACHE = {}
+# (name, class) pairs of all concrete estimators found by crawling sklearn
+_ESTIMATOR_CLASSES = None
+
+
+def _discover_estimators():
+    """Crawl sklearn once and return all concrete estimator classes."""
+    global _ESTIMATOR_CLASSES
+    if _ESTIMATOR_CLASSES is not None:
+        return _ESTIMATOR_CLASSES
+
+    def is_abstract(c):
+        if not(hasattr(c, '__abstractmethods__')):
+            return False
+        if not len(c.__abstractmethods__):
+            return False
+        return True
+
+    all_classes = []
+    # get parent folder
+    path = sklearn.__path__
+    for importer, modname, ispkg in pkgutil.walk_packages(
+            path=path, prefix='sklearn.', onerror=lambda x: None):
+        # skip test and build modules before importing them: they cannot
+        # define estimators and are expensive to import
+        if (".tests." in modname or modname.endswith(".setup")
+                or modname == "sklearn._build_utils"):
+            continue
+        try:
+            module = __import__(modname, fromlist="dummy")
+        except ImportError:
+            # e.g. a module depending on a missing optional dependency
+            continue
+        classes = inspect.getmembers(module, inspect.isclass)
+        all_classes.extend(classes)
+
+    all_classes = set(all_classes)
+
+    # keep estimators, getting rid of abstract base classes
+    estimators = [c for c in all_classes
+                  if (issubclass(c[1], BaseEstimator)
+                      and c[0] != 'BaseEstimator'
+                      and not is_abstract(c[1]))]
+
+    _ESTIMATOR_CLASSES = estimators
+    return estimators
+
 
 def all_estimators(include_meta_estimators=False, include_other=False,
                    type_filter=None):
@@ -455,57 +502,33 @@ def all_estimators(include_meta_estimators=False, include_other=False,
         List of (name, class), where ``name`` is the class name as string
         and ``class`` is the actuall type of the class.
     """
-    def is_abstract(c):
-        if not(hasattr(c, '__abstractmethods__')):
-            return False
-        if not len(c.__abstractmethods__):
-            return False
-        return True
-
-    all_classes = []
-    # get parent folder
-    path = sklearn.__path__
-    for importer, modname, ispkg in pkgutil.walk_packages(
-            path=path, prefix='sklearn.', onerror=lambda x: None):
-        if ".tests." in modname:
-            continue
-        module = __import__(modname, fromlist="dummy")
-        classes = inspect.getmembers(module, inspect.isclass)
-        all_classes.extend(classes)
+    key = (include_meta_estimators, include_other, type_filter)
+    if key in _ALL_ESTIMATORS_CACHE:
+        # return a copy so that callers can modify the list
+        return list(_ALL_ESTIMATORS_CACHE[key])
 
-    all_classes = set(all_classes)
-
-    estimators = [c for c in all_classes
-                  if (issubclass(c[1], BaseEstimator)
-                      and c[0] != 'BaseEstimator')]
-    # get rid of abstract base classes
-    estimators = [c for c in estimators if not is_abstract(c[1])]
+    if type_filter is not None and type_filter not in _TYPE_FILTER_MIXINS:
+        raise ValueError("Parameter type_filter must be 'classifier', "
+                         "'regressor', 'transformer', 'cluster' or None, got"
+                         " %s." % repr(type_filter))
+    mixin = _TYPE_FILTER_MIXINS.get(type_filter)
 
+    excluded = set()
     if not include_other:
-        estimators = [c for c in estimators if not c[0] in other]
+        excluded.update(other)
     # possibly get rid of meta estimators
     if not include_meta_estimators:
-        estimators = [c for c in estimators if not c[0] in meta_estimators]
-
-    if type_filter == 'classifier':
-        estimators = [est for est in estimators
-                      if issubclass(est[1], ClassifierMixin)]
-    elif type_filter == 'regressor':
-        estimators = [est for est in estimators
-                      if issubclass(est[1], RegressorMixin)]
-    elif type_filter == 'transformer':
-        estimators = [est for est in estimators
-                      if issubclass(est[1], TransformerMixin)]
-    elif type_filter == 'cluster':
-        estimators = [est for est in estimators
-                      if issubclass(est[1], ClusterMixin)]
-    elif type_filter is not None:
-        raise ValueError("Parameter type_filter must be 'classifier', "
-                         "'regressor', 'transformer', 'cluster' or None, got"
-                         " %s." % repr(type_filter))
+        excluded.update(meta_estimators)
+
+    # select in a single pass over the discovered estimators
+    estimators = [est for est in _discover_estimators()
+                  if est[0] not in excluded
+                  and (mixin is None or issubclass(est[1], mixin))]
 
     # We sort in order to have reproducible test failures
-    return sorted(estimators)
+    estimators = sorted(estimators)
+    _ALL_ESTIMATORS_CACHE[key] = estimators
+    return list(estimators)
 
 
 def set_random_state(estimator, random_state=0):
@@ -534,6 +557,11 @@ def clean_warning_registry():
     """Safe way to reset warniings """
     warnings.resetwarnings()
     reg = "__warningregistry__"
-    for mod in sys.modules.values():
-        if hasattr(mod, reg):
-            getattr(mod, reg).clear()
+    # A registry is created in the calling module even for warnings that are
+    # filtered out and never shown, so hooking showwarning cannot tell which
+    # modules to visit: scan them all, with a single attribute lookup each.
+    # Iterate over a copy: sys.modules may change while we loop.
+    for mod in list(sys.modules.values()):
+        registry = getattr(mod, reg, None)
+        if registry:
+            registry.clear()